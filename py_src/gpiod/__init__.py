@@ -21,7 +21,11 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-from . import libgpiodcxx
+from ctypes import get_errno
+from errno import ENOENT
+from os import strerror
+
+from . import libgpiod, libgpiodcxx
 
 
 class chip(libgpiodcxx.chip):
@@ -45,12 +49,17 @@ def find_line(name: str) -> line:
 
     @return A line object - empty if the line was not found.
     """
-    for c in chip_iter():
-        ret = c.find_line(name)
-        if bool(ret):
-            return ret
+    line_struct = libgpiod.gpiod_line_find(name)
+    if line_struct is None:
+        errno = get_errno()
+        if errno != ENOENT:
+            raise OSError(errno, strerror(errno), "error looking up GPIO line by name")
+
+        return line()
 
-    return ret
+    # The chip stays open as long as the line refers to it.
+    owner = chip(chip_shared=libgpiodcxx.shared_chip(line_struct.chip))
+    return line(line_struct, owner)
 
 
 class line_event(libgpiodcxx.line_event):
@@ -85,3 +94,13 @@ def make_chip_iter() -> chip_iter:
 class line_iter(libgpiodcxx.line_iter):
     # pylint: disable=too-few-public-methods
     pass
+
+
+def invalidate_caches() -> None:
+    """
+    @brief Forget what is cached about the GPIO chips present on the system.
+
+    Call this after GPIO chips have been added or removed at runtime (e.g.
+    hotplug), so that the next lookup sees them.
+    """
+    libgpiod.gpiod_invalidate_caches()
@@ -22,6 +22,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 from ctypes import sizeof
+from functools import lru_cache
 from typing import Any
 
 _IOC_NRBITS = 8
@@ -54,7 +55,8 @@ def _IOC(dir_: int, type_: int, nr: int, size: int) -> int:
 
 
 # @param t: ctypes data type
-_IOC_TYPECHECK = sizeof
+# The size of a ctypes type never changes, so it is only computed once per type.
+_IOC_TYPECHECK = lru_cache(maxsize=None)(sizeof)
 
 
 def _IOR(type_: int, nr: int, data_type: Any) -> int:
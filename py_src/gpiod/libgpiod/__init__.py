@@ -21,22 +21,27 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from __future__ import annotations
+
 import select
-from ctypes import memmove, memset, pointer, set_errno, sizeof
+from ctypes import addressof, c_uint32, get_errno, memmove, memset, set_errno, sizeof
 from datetime import datetime, timedelta
 from errno import EBUSY, EINVAL, EIO, ENODEV, ENOENT, ENOTTY, EPERM
 from fcntl import ioctl
-from os import O_CLOEXEC, O_RDWR, R_OK, access
+from os import O_CLOEXEC, O_RDONLY, O_RDWR
 from os import close as os_close
-from os import lstat, major, minor
+from os import fstat, makedev
 from os import open as os_open
 from os import read as os_read
-from os import scandir
+from os import readv, scandir, strerror
 from os.path import basename
 from os.path import realpath
-from select import POLLIN, POLLNVAL, POLLPRI
+from select import EPOLLIN, EPOLLPRI, POLLIN, POLLNVAL, POLLPRI
 from stat import S_ISCHR
-from typing import Iterator, List, Optional, Union
+from struct import Struct
+from threading import local
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from ..kernel import *
 from .gpiod_h import *
@@ -47,15 +52,101 @@ _LINE_FREE = 0
 _LINE_REQUESTED_VALUES = 1
 _LINE_REQUESTED_EVENTS = 2
 
+_LINE_REQUESTED = frozenset((_LINE_REQUESTED_VALUES, _LINE_REQUESTED_EVENTS))
+
+
+# Maximum number of events read by a single gpiod_line_event_read_fd_multiple()
+_LINE_EVENT_READ_MAX = 16
+
+# Leading timestamp and id fields of gpioevent_data, which may be followed by
+# padding up to _EVDATA_SIZE depending on the architecture.
+_EVDATA_STRUCT = Struct("=QI")
+_EVDATA_SIZE = sizeof(gpioevent_data)
+
+# Indexed by whether the kernel event id is GPIOEVENT_EVENT_RISING_EDGE
+_EVENT_TYPE = (GPIOD_LINE_EVENT_FALLING_EDGE, GPIOD_LINE_EVENT_RISING_EDGE)
+
+# Event timestamps are nanoseconds since the epoch of their clock
+_EPOCH = datetime(year=1970, month=1, day=1)
+
+
+class _ioctl_buffers(local):
+    """
+    @brief Per-thread ioctl() argument structures and event read buffers,
+           allocated once and reused instead of creating new objects on every
+           call.
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        super().__init__()
+        self.chip_info = gpiochip_info()
+        self.line_info = gpioline_info()
+        self.handle_request = gpiohandle_request()
+        self.handle_data = gpiohandle_data()
+        self.handle_config = gpiohandle_config()
+        self.event_data = bytearray(_EVDATA_SIZE)
+        self.event_data_multiple = memoryview(bytearray(_EVDATA_SIZE * _LINE_EVENT_READ_MAX))
+
+
+_buffers = _ioctl_buffers()
+
+
+_SYSFS_GPIO_DEVICES = "/sys/bus/gpio/devices/"
+
+# The device numbers of a gpiochip do not change while it exists, so its
+# sysfs dev attribute is only read the first time the chip is opened.
+_sysfs_devs: Dict[str, int] = {}
+
+# Result of _gpiochip_sysfs_check() (0 or an errno value) per device node,
+# keyed by (st_rdev, st_ino).
+_cdev_cache: Dict[Tuple[int, int], int] = {}
 
-def _is_gpiochip_cdev(path: str) -> bool:
-    # Sanitize the path before performing checks on it
-    path = realpath(path)
+
+def _gpiochip_sysfs_dev(name: str, reload: bool = False) -> Optional[int]:
+    if not reload and name in _sysfs_devs:
+        return _sysfs_devs[name]
 
     try:
-        statbuf = lstat(path)
-    except FileNotFoundError:
-        return False
+        fd = os_open(_SYSFS_GPIO_DEVICES + name + "/dev", O_RDONLY | O_CLOEXEC)
+        try:
+            dev_major, dev_minor = os_read(fd, 32).split(b":")
+        finally:
+            os_close(fd)
+        sysfsdev = makedev(int(dev_major), int(dev_minor))
+    except (OSError, ValueError):
+        _sysfs_devs.pop(name, None)
+        return None
+
+    _sysfs_devs[name] = sysfsdev
+    return sysfsdev
+
+
+def _gpiochip_sysfs_check(name: str, rdev: int) -> int:
+    # Make sure the major and minor numbers of the character device
+    # correspond to the ones in the dev attribute in sysfs.
+    sysfsdev = _gpiochip_sysfs_dev(name)
+    if sysfsdev is not None and sysfsdev != rdev:
+        # The chip may have been replaced since its numbers were cached.
+        sysfsdev = _gpiochip_sysfs_dev(name, reload=True)
+
+    if sysfsdev is None:
+        # This is a character device but not the one we're after.
+        # Before the introduction of this function, we'd fail with
+        # ENOTTY on the first GPIO ioctl() call for this file
+        # descriptor. Let's stay compatible here and keep returning
+        # the same error code.
+        return ENOTTY
+
+    if sysfsdev != rdev:
+        return ENODEV
+
+    return 0
+
+
+def _is_gpiochip_cdev(fd: int, path: str) -> bool:
+    # Check the opened file itself, so the path cannot be swapped in between
+    statbuf = fstat(fd)
 
     # Is it a character device?
     if not S_ISCHR(statbuf.st_mode):
@@ -66,33 +157,35 @@ def _is_gpiochip_cdev(path: str) -> bool:
         set_errno(ENOTTY)
         return False
 
-    # Do we have a corresponding sysfs attribute?
-    name = basename(path)
-    sysfsp = f"/sys/bus/gpio/devices/{name}/dev"
-    if not access(sysfsp, R_OK):
-        # This is a character device but not the one we're after.
-        # Before the introduction of this function, we'd fail with
-        # ENOTTY on the first GPIO ioctl() call for this file
-        # descriptor. Let's stay compatible here and keep returning
-        # the same error code.
-        set_errno(ENOTTY)
+    # The outcome of the sysfs check below only depends on the device node,
+    # so it is remembered for every node that has been checked.
+    key = (statbuf.st_rdev, statbuf.st_ino)
+    if key not in _cdev_cache:
+        # Sanitize the path before looking up its sysfs attribute
+        name = basename(realpath(path))
+        _cdev_cache[key] = _gpiochip_sysfs_check(name, statbuf.st_rdev)
+
+    error = _cdev_cache[key]
+    if error:
+        set_errno(error)
         return False
 
-    # Make sure the major and minor numbers of the character device
-    # correspond to the ones in the dev attribute in sysfs.
-    devstr = f"{major(statbuf.st_rdev)}:{minor(statbuf.st_rdev)}"
+    return True
 
-    try:
-        with open(sysfsp, "r", encoding="utf-8") as fd:
-            sysfsdev = fd.read(len(devstr))
-    except FileNotFoundError:
-        return False
 
-    if sysfsdev != devstr:
-        set_errno(ENODEV)
-        return False
+def gpiod_invalidate_caches() -> None:
+    """
+    @brief Forget the cached results of the gpiochip device checks and
+           lookups.
 
-    return True
+    @note Call this after GPIO chips have been added or removed at runtime
+          (e.g. hotplug) so that the next open checks the device again.
+    """
+    _sysfs_devs.clear()
+    _cdev_cache.clear()
+    _chip_labels.clear()
+    _line_index.clear()
+    _gpiochip_paths_invalidate()
 
 
 def gpiod_chip_open(path: str) -> Optional[gpiod_chip]:
@@ -103,28 +196,27 @@ def gpiod_chip_open(path: str) -> Optional[gpiod_chip]:
 
     @return GPIO chip handle or None if an error occurred.
     """
-    info = gpiochip_info()
-
     try:
         fd = os_open(path, O_RDWR | O_CLOEXEC)
     except FileNotFoundError:
+        set_errno(ENOENT)
         return None
 
     # We were able to open the file but is it really a gpiochip character
     # device?
-    if not _is_gpiochip_cdev(path):
+    if not _is_gpiochip_cdev(fd, path):
         os_close(fd)
         return None
 
+    # The kernel fills in the whole structure, no need to clear it first.
+    info = _buffers.chip_info
     status = ioctl(fd, GPIO_GET_CHIPINFO_IOCTL, info)
     if status < 0:
         os_close(fd)
         return None
 
-    if not info.label or info.label[0] == "\0":
-        label = "unknown"
-    else:
-        label = info.label.decode()
+    # The c_char array fields are already cut at the first NUL byte.
+    label = info.label.decode() or "unknown"
 
     return gpiod_chip(num_lines=info.lines, fd=fd, name=info.name.decode(), label=label)
 
@@ -135,15 +227,20 @@ def gpiod_chip_close(chip: gpiod_chip) -> None:
 
     @param chip: The GPIO chip object.
     """
-    if len(chip.lines) > 0:
-        for i in range(chip.num_lines):
-            line = chip.lines[i]
-            if line is not None:
-                gpiod_line_release(line)
+    if chip.fd < 0:
+        return
+
+    # pylint: disable=protected-access
+    for line in chip._allocated:
+        gpiod_line_release(line)
 
     os_close(chip.fd)
-    # How to free the chip object?
-    del chip
+
+    # The fd number may be reused by now, make sure it is never closed twice.
+    chip._fd = -1
+    chip._num_lines = 0
+    chip.lines = []
+    chip._allocated = []
 
 
 def gpiod_chip_get_line(chip: gpiod_chip, offset: int) -> Optional[gpiod_line]:
@@ -165,6 +262,8 @@ def gpiod_chip_get_line(chip: gpiod_chip, offset: int) -> Optional[gpiod_line]:
         line.offset = offset
 
         chip.lines[offset] = line
+        # pylint: disable=protected-access
+        chip._allocated.append(line)
 
     status = gpiod_line_update(chip.lines[offset])
     if status < 0:
@@ -229,6 +328,11 @@ def gpiod_line_is_open_source(line: gpiod_line) -> bool:
     return bool(line.info_flags & GPIOLINE_FLAG_OPEN_SOURCE)
 
 
+# Indexed by whether GPIOLINE_FLAG_IS_OUT/GPIOLINE_FLAG_ACTIVE_LOW is set
+_LINE_DIRECTION = (GPIOD_LINE_DIRECTION_INPUT, GPIOD_LINE_DIRECTION_OUTPUT)
+_LINE_ACTIVE_STATE = (GPIOD_LINE_ACTIVE_STATE_HIGH, GPIOD_LINE_ACTIVE_STATE_LOW)
+
+
 def gpiod_line_update(line: gpiod_line) -> int:
     """
     @brief Re-read the line info.
@@ -252,7 +356,8 @@ def gpiod_line_update(line: gpiod_line) -> int:
     changed by external agents while the ownership of the line is taken) so
     there's no need to call this function in that case.
     """
-    info = gpioline_info()
+    # The kernel only reads line_offset and fills in all other fields.
+    info = _buffers.line_info
 
     info.line_offset = line.offset
 
@@ -260,17 +365,10 @@ def gpiod_line_update(line: gpiod_line) -> int:
     if status < 0:
         return -1
 
-    line.direction = (
-        GPIOD_LINE_DIRECTION_OUTPUT
-        if info.flags & GPIOLINE_FLAG_IS_OUT
-        else GPIOD_LINE_DIRECTION_INPUT
-    )
-    line.active_state = (
-        GPIOD_LINE_ACTIVE_STATE_LOW
-        if info.flags & GPIOLINE_FLAG_ACTIVE_LOW
-        else GPIOD_LINE_ACTIVE_STATE_HIGH
-    )
-    line.info_flags = info.flags
+    flags = info.flags
+    line.direction = _LINE_DIRECTION[(flags & GPIOLINE_FLAG_IS_OUT) != 0]
+    line.active_state = _LINE_ACTIVE_STATE[(flags & GPIOLINE_FLAG_ACTIVE_LOW) != 0]
+    line.info_flags = flags
 
     line.name = info.name.decode()
     line.consumer = info.consumer.decode()
@@ -278,76 +376,115 @@ def gpiod_line_update(line: gpiod_line) -> int:
     return 0
 
 
-def _line_bulk_same_chip(bulk: gpiod_line_bulk) -> bool:
-    if bulk.num_lines == 1:
-        return True
+# Line info flags use the same bits as the handle request flags, except for
+# GPIOLINE_FLAG_KERNEL which is set for every requested line.
+_HANDLEFLAG_DIRECTION_MASK = GPIOHANDLE_REQUEST_INPUT | GPIOHANDLE_REQUEST_OUTPUT
+_HANDLEFLAG_DRIVE_MASK = GPIOHANDLE_REQUEST_OPEN_DRAIN | GPIOHANDLE_REQUEST_OPEN_SOURCE
 
-    first_chip = bulk[0].chip
 
-    for it in bulk:
-        if it.chip != first_chip:
-            set_errno(EINVAL)
-            return False
+def _line_update_requested(line: gpiod_line, handleflags: int, consumer: Optional[bytes]) -> int:
+    # The direction of an as-is request and of emulated open-drain/open-source
+    # outputs is only known to the kernel.
+    if not handleflags & _HANDLEFLAG_DIRECTION_MASK or handleflags & _HANDLEFLAG_DRIVE_MASK:
+        return gpiod_line_update(line)
+
+    flags = GPIOLINE_FLAG_KERNEL | (handleflags & ~GPIOHANDLE_REQUEST_INPUT)
+    line.direction = _LINE_DIRECTION[(flags & GPIOLINE_FLAG_IS_OUT) != 0]
+    line.active_state = _LINE_ACTIVE_STATE[(flags & GPIOLINE_FLAG_ACTIVE_LOW) != 0]
+    line.info_flags = flags
+
+    if consumer is not None:
+        # The kernel truncates the label and falls back to "?" for no label.
+        line.consumer = consumer[:31].decode() or "?"
+
+    return 0
+
+
+def _line_bulk_same_chip(bulk: gpiod_line_bulk) -> bool:
+    # Tracked by gpiod_line_bulk.add()
+    if not bulk.same_chip:
+        set_errno(EINVAL)
+        return False
 
     return True
 
 
 def _line_bulk_all_requested(bulk: gpiod_line_bulk) -> bool:
-    for it in bulk:
-        if not gpiod_line_is_requested(it):
-            set_errno(EPERM)
-            return False
+    if not all(it.state in _LINE_REQUESTED for it in bulk):
+        set_errno(EPERM)
+        return False
 
     return True
 
 
 def _line_bulk_all_free(bulk: gpiod_line_bulk) -> bool:
-    for it in bulk:
-        if not gpiod_line_is_free(it):
-            set_errno(EBUSY)
-            return False
+    if not all(it.state == _LINE_FREE for it in bulk):
+        set_errno(EBUSY)
+        return False
 
     return True
 
 
-def _line_request_direction_is_valid(direction: int) -> bool:
-    if direction in (
+_DIRECTION_REQUESTS = frozenset(
+    (
         GPIOD_LINE_REQUEST_DIRECTION_AS_IS,
         GPIOD_LINE_REQUEST_DIRECTION_INPUT,
         GPIOD_LINE_REQUEST_DIRECTION_OUTPUT,
-    ):
+    )
+)
+
+_EVENT_REQUESTS = frozenset(
+    (
+        GPIOD_LINE_REQUEST_EVENT_FALLING_EDGE,
+        GPIOD_LINE_REQUEST_EVENT_RISING_EDGE,
+        GPIOD_LINE_REQUEST_EVENT_BOTH_EDGES,
+    )
+)
+
+
+def _line_request_direction_is_valid(direction: int) -> bool:
+    if direction in _DIRECTION_REQUESTS:
         return True
 
     set_errno(EINVAL)
     return False
 
 
-def _line_request_direction_to_gpio_handleflag(direction: int) -> int:
-    if direction == GPIOD_LINE_REQUEST_DIRECTION_INPUT:
-        return GPIOHANDLE_REQUEST_INPUT
-    if direction == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT:
-        return GPIOHANDLE_REQUEST_OUTPUT
+_REQUEST_DIRECTION_TO_HANDLEFLAG = {
+    GPIOD_LINE_REQUEST_DIRECTION_INPUT: GPIOHANDLE_REQUEST_INPUT,
+    GPIOD_LINE_REQUEST_DIRECTION_OUTPUT: GPIOHANDLE_REQUEST_OUTPUT,
+}
 
-    return 0
+_REQUEST_EVENT_TO_EVENTFLAG = {
+    GPIOD_LINE_REQUEST_EVENT_RISING_EDGE: GPIOEVENT_REQUEST_RISING_EDGE,
+    GPIOD_LINE_REQUEST_EVENT_FALLING_EDGE: GPIOEVENT_REQUEST_FALLING_EDGE,
+    GPIOD_LINE_REQUEST_EVENT_BOTH_EDGES: GPIOEVENT_REQUEST_BOTH_EDGES,
+}
 
+_REQUEST_FLAGS = (
+    (GPIOD_LINE_REQUEST_FLAG_OPEN_DRAIN, GPIOHANDLE_REQUEST_OPEN_DRAIN),
+    (GPIOD_LINE_REQUEST_FLAG_OPEN_SOURCE, GPIOHANDLE_REQUEST_OPEN_SOURCE),
+    (GPIOD_LINE_REQUEST_FLAG_ACTIVE_LOW, GPIOHANDLE_REQUEST_ACTIVE_LOW),
+    (GPIOD_LINE_REQUEST_FLAG_BIAS_DISABLE, GPIOHANDLE_REQUEST_BIAS_DISABLE),
+    (GPIOD_LINE_REQUEST_FLAG_BIAS_PULL_DOWN, GPIOHANDLE_REQUEST_BIAS_PULL_DOWN),
+    (GPIOD_LINE_REQUEST_FLAG_BIAS_PULL_UP, GPIOHANDLE_REQUEST_BIAS_PULL_UP),
+)
 
-def _line_request_flag_to_gpio_handleflag(flags: int) -> int:
-    hflags = 0
+_REQUEST_FLAG_MASK = sum(flag for flag, _ in _REQUEST_FLAGS)
+
+# Handle flags for every combination of request flags, indexed by the latter
+_REQUEST_FLAG_TO_HANDLEFLAG = tuple(
+    sum(hflag for flag, hflag in _REQUEST_FLAGS if flags & flag)
+    for flags in range(_REQUEST_FLAG_MASK + 1)
+)
+
+
+def _line_request_direction_to_gpio_handleflag(direction: int) -> int:
+    return _REQUEST_DIRECTION_TO_HANDLEFLAG.get(direction, 0)
 
-    if flags & GPIOD_LINE_REQUEST_FLAG_OPEN_DRAIN:
-        hflags |= GPIOHANDLE_REQUEST_OPEN_DRAIN
-    if flags & GPIOD_LINE_REQUEST_FLAG_OPEN_SOURCE:
-        hflags |= GPIOHANDLE_REQUEST_OPEN_SOURCE
-    if flags & GPIOD_LINE_REQUEST_FLAG_ACTIVE_LOW:
-        hflags |= GPIOHANDLE_REQUEST_ACTIVE_LOW
-    if flags & GPIOD_LINE_REQUEST_FLAG_BIAS_DISABLE:
-        hflags |= GPIOHANDLE_REQUEST_BIAS_DISABLE
-    if flags & GPIOD_LINE_REQUEST_FLAG_BIAS_PULL_DOWN:
-        hflags |= GPIOHANDLE_REQUEST_BIAS_PULL_DOWN
-    if flags & GPIOD_LINE_REQUEST_FLAG_BIAS_PULL_UP:
-        hflags |= GPIOHANDLE_REQUEST_BIAS_PULL_UP
 
-    return hflags
+def _line_request_flag_to_gpio_handleflag(flags: int) -> int:
+    return _REQUEST_FLAG_TO_HANDLEFLAG[flags & _REQUEST_FLAG_MASK]
 
 
 def _line_request_values(
@@ -368,20 +505,18 @@ def _line_request_values(
         return -1
 
     # pylint: disable=no-member
-    req = gpiohandle_request()
+    req = _buffers.handle_request
+    memset(addressof(req), 0, sizeof(req))
 
     req.lines = bulk.num_lines
     req.flags = _line_request_flag_to_gpio_handleflag(config.flags)
+    req.flags |= _line_request_direction_to_gpio_handleflag(config.request_type)
 
-    if config.request_type == GPIOD_LINE_REQUEST_DIRECTION_INPUT:
-        req.flags |= GPIOHANDLE_REQUEST_INPUT
-    elif config.request_type == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT:
-        req.flags |= GPIOHANDLE_REQUEST_OUTPUT
+    memmove(req.lineoffsets, bulk.offsets, bulk.num_lines * sizeof(c_uint32))
 
-    for i in range(bulk.num_lines):
-        req.lineoffsets[i] = bulk[i].offset
-        if config.request_type == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT and default_vals:
-            req.default_values[i] = 1 if default_vals[i] else 0
+    if config.request_type == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT and default_vals:
+        packed = bytes(1 if value else 0 for value in default_vals[: bulk.num_lines])
+        memmove(req.default_values, packed, len(packed))
 
     if config.consumer:
         req.consumer_label = config.consumer[:32].encode()
@@ -393,17 +528,28 @@ def _line_request_values(
         return -1
 
     # line_fd = line_make_fd_handle(req.fd)
-    line_fd = line_fd_handle(req.fd)
+    line_fd = line_fd_handle(req.fd, list(bulk))
+    handleflags = req.flags
+    consumer = req.consumer_label
 
-    for i, line in enumerate(bulk):
+    # One slice copies the C array instead of an element access per line.
+    output_values = req.default_values[: bulk.num_lines]
+
+    for line, output_value in zip(bulk, output_values):
         line.state = _LINE_REQUESTED_VALUES
         line.req_flags = config.flags
         if config.request_type == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT:
-            line.output_value = req.default_values[i]
+            line.output_value = output_value
         # line_set_fd(line, line_fd)
         line.fd_handle = line_fd
 
-        rv = gpiod_line_update(line)
+        rv = _line_update_requested(line, handleflags, consumer)
+        if rv:
+            gpiod_line_release_bulk(bulk)
+            return rv
+
+    if config.request_type == GPIOD_LINE_REQUEST_DIRECTION_AS_IS:
+        rv = _line_handle_read_values(line_fd)
         if rv:
             gpiod_line_release_bulk(bulk)
             return rv
@@ -411,6 +557,20 @@ def _line_request_values(
     return 0
 
 
+def _line_handle_read_values(handle: line_fd_handle) -> int:
+    # Lines kept as-is drive whatever they did before the request, read the
+    # values back so that output_value is exact.
+    data = _buffers.handle_data
+    status = ioctl(handle.fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
+    if status < 0:
+        return -1
+
+    for line, value in zip(handle.lines, data.values[: len(handle.lines)]):
+        line.output_value = value
+
+    return 0
+
+
 def _line_request_event_single(line: gpiod_line, config: gpiod_line_request_config) -> int:
     # pylint: disable=no-member
     req = gpioevent_request()
@@ -420,26 +580,20 @@ def _line_request_event_single(line: gpiod_line, config: gpiod_line_request_conf
     req.lineoffset = line.offset
     req.handleflags = _line_request_flag_to_gpio_handleflag(config.flags)
     req.handleflags |= GPIOHANDLE_REQUEST_INPUT
-
-    if config.request_type == GPIOD_LINE_REQUEST_EVENT_RISING_EDGE:
-        req.eventflags |= GPIOEVENT_REQUEST_RISING_EDGE
-    elif config.request_type == GPIOD_LINE_REQUEST_EVENT_FALLING_EDGE:
-        req.eventflags |= GPIOEVENT_REQUEST_FALLING_EDGE
-    elif config.request_type == GPIOD_LINE_REQUEST_EVENT_BOTH_EDGES:
-        req.eventflags |= GPIOEVENT_REQUEST_BOTH_EDGES
+    req.eventflags = _REQUEST_EVENT_TO_EVENTFLAG.get(config.request_type, 0)
 
     status = ioctl(line.chip.fd, GPIO_GET_LINEEVENT_IOCTL, req)
     if status < 0:
         return -1
 
-    line_fd = line_fd_handle(req.fd)
+    line_fd = line_fd_handle(req.fd, [line])
 
     line.state = _LINE_REQUESTED_EVENTS
     line.req_flags = config.flags
     # line_set_fd(line, line_fd)
     line.fd_handle = line_fd
 
-    rv = gpiod_line_update(line)
+    rv = _line_update_requested(line, req.handleflags, req.consumer_label)
     if rv:
         gpiod_line_release(line)
         return rv
@@ -484,19 +638,11 @@ def gpiod_line_request(
 
 
 def _line_request_is_direction(request: int) -> bool:
-    return request in [
-        GPIOD_LINE_REQUEST_DIRECTION_AS_IS,
-        GPIOD_LINE_REQUEST_DIRECTION_INPUT,
-        GPIOD_LINE_REQUEST_DIRECTION_OUTPUT,
-    ]
+    return request in _DIRECTION_REQUESTS
 
 
 def _line_request_is_events(request: int) -> bool:
-    return request in [
-        GPIOD_LINE_REQUEST_EVENT_FALLING_EDGE,
-        GPIOD_LINE_REQUEST_EVENT_RISING_EDGE,
-        GPIOD_LINE_REQUEST_EVENT_BOTH_EDGES,
-    ]
+    return request in _EVENT_REQUESTS
 
 
 def gpiod_line_request_bulk(
@@ -537,11 +683,9 @@ def gpiod_line_release(line: gpiod_line) -> None:
 
     @param line: GPIO line object.
     """
-    bulk = gpiod_line_bulk()
-
-    bulk.add(line)
-
-    gpiod_line_release_bulk(bulk)
+    # line_fd_decref(line)
+    line.fd_handle = None
+    line.state = _LINE_FREE
 
 
 def gpiod_line_release_bulk(bulk: gpiod_line_bulk) -> None:
@@ -567,7 +711,7 @@ def gpiod_line_is_requested(line: gpiod_line) -> bool:
 
     @return True if given line was requested, false otherwise.
     """
-    return line.state in (_LINE_REQUESTED_VALUES, _LINE_REQUESTED_EVENTS)
+    return line.state in _LINE_REQUESTED
 
 
 def gpiod_line_is_free(line: gpiod_line) -> bool:
@@ -591,16 +735,19 @@ def gpiod_line_get_value(line: gpiod_line) -> int:
     @return 0 or 1 if the operation succeeds. On error this routine returns -1
             and sets the last error number.
     """
-    bulk = gpiod_line_bulk()
-    value = [0]
+    if not gpiod_line_is_requested(line):
+        set_errno(EPERM)
+        return -1
 
-    bulk.add(line)
+    handle = line.fd_handle
+    data = _buffers.handle_data
 
-    status = gpiod_line_get_value_bulk(bulk, value)
+    status = ioctl(handle.fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
     if status < 0:
         return -1
 
-    return value[0]
+    # The handle may be shared with other lines, pick the value of this one.
+    return data.values[handle.lines.index(line)]
 
 
 def gpiod_line_get_value_bulk(bulk: gpiod_line_bulk, values: List[int]) -> int:
@@ -617,19 +764,34 @@ def gpiod_line_get_value_bulk(bulk: gpiod_line_bulk, values: List[int]) -> int:
     the same order, the lines are added to line_bulk. If the lines were not
     previously requested together, the behavior is undefined.
     """
-    data = gpiohandle_data()
-
     if not _line_bulk_same_chip(bulk) or not _line_bulk_all_requested(bulk):
         return -1
 
-    fd = bulk[0].fd_handle.fd
+    handle = bulk[0].fd_handle
 
-    status = ioctl(fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
-    if status < 0:
-        return -1
+    if all(line.fd_handle is handle for line in bulk):
+        # The kernel fills in the values of every line of the handle, a single
+        # ioctl() reads them all.
+        data = _buffers.handle_data
+        status = ioctl(handle.fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
+        if status < 0:
+            return -1
 
-    for i in range(bulk.num_lines):
-        values[i] = data.values[i]
+        handle_values = data.values[: len(handle.lines)]
+        if _line_bulk_is_handle(bulk, handle):
+            for i in range(bulk.num_lines):
+                values[i] = handle_values[i]
+        else:
+            for i, line in enumerate(bulk):
+                values[i] = handle_values[handle.lines.index(line)]
+    else:
+        # e.g. lines requested for events have a handle per line.
+        for i, line in enumerate(bulk):
+            value = gpiod_line_get_value(line)
+            if value < 0:
+                return -1
+
+            values[i] = value
 
     return 0
 
@@ -644,11 +806,16 @@ def gpiod_line_set_value(line: gpiod_line, value: int) -> int:
     @return 0 is the operation succeeds. In case of an error this routine
             returns -1 and sets the last error number.
     """
-    bulk = gpiod_line_bulk()
+    if not gpiod_line_is_requested(line):
+        set_errno(EPERM)
+        return -1
 
-    bulk.add(line)
+    # The handle may be shared with other lines, they keep their values.
+    handle = line.fd_handle
+    packed = bytearray(it.output_value for it in handle.lines)
+    packed[handle.lines.index(line)] = 1 if value else 0
 
-    return gpiod_line_set_value_bulk(bulk, [value])
+    return _line_set_values(handle, bytes(packed))
 
 
 def gpiod_line_set_value_bulk(bulk: gpiod_line_bulk, values: Optional[List[int]] = None) -> int:
@@ -661,28 +828,113 @@ def gpiod_line_set_value_bulk(bulk: gpiod_line_bulk, values: Optional[List[int]]
     @return 0 is the operation succeeds. In case of an error this routine
             returns -1 and sets the last error number.
 
-    If the lines were not previously requested together, the behavior is
-    undefined.
+    If the lines were not previously requested together, this routine fails
+    with EINVAL. The lines requested together with the bulk but not part of it
+    keep their output values.
+
+    If all lines are outputs already driven to the requested values, the
+    kernel is not called. The cached values are exact: output requests and
+    configs set them, as-is requests and configs read them back, and every set
+    updates them. Use gpiod_line_set_value_bulk_force() to always
+    re-drive the lines.
     """
-    data = gpiohandle_data()
+    if not _line_bulk_same_chip(bulk) or not _line_bulk_all_requested(bulk):
+        return -1
+
+    handle = _line_bulk_handle(bulk)
+    if handle is None:
+        return -1
+
+    packed = _line_bulk_pack_values(bulk, values)
 
+    # No one else can change the value of a line while we own it.
+    if all(
+        line.state == _LINE_REQUESTED_VALUES
+        and line.direction == GPIOD_LINE_DIRECTION_OUTPUT
+        and line.output_value == value
+        for line, value in zip(bulk, packed)
+    ):
+        return 0
+
+    return _line_set_values(handle, _line_handle_pack_values(handle, bulk, packed))
+
+
+def gpiod_line_set_value_bulk_force(
+    bulk: gpiod_line_bulk, values: Optional[List[int]] = None
+) -> int:
+    """
+    @brief Set the values of a set of GPIO lines, even if they already have
+           these values.
+
+    @param bulk:   Set of GPIO lines to reserve.
+    @param values: An array holding line_bulk->num_lines new values for lines.
+
+    @return 0 is the operation succeeds. In case of an error this routine
+            returns -1 and sets the last error number.
+
+    Unlike gpiod_line_set_value_bulk(), this routine always passes the values
+    to the kernel. If the lines were not previously requested together, it
+    fails with EINVAL.
+    """
     if not _line_bulk_same_chip(bulk) or not _line_bulk_all_requested(bulk):
         return -1
 
-    memset(pointer(data), 0, sizeof(data))
+    handle = _line_bulk_handle(bulk)
+    if handle is None:
+        return -1
+
+    packed = _line_bulk_pack_values(bulk, values)
+    return _line_set_values(handle, _line_handle_pack_values(handle, bulk, packed))
+
+
+def _line_bulk_pack_values(bulk: gpiod_line_bulk, values: Optional[List[int]]) -> bytes:
+    # Missing values are interpreted as a logical low.
+    if values is None:
+        return bytes(bulk.num_lines)
 
-    if values is not None:
-        for i in range(bulk.num_lines):
-            data.values[i] = 1 if values[i] else 0
+    packed = bytes(1 if value else 0 for value in values[: bulk.num_lines])
+    return packed.ljust(bulk.num_lines, b"\0")
 
-    fd = bulk[0].fd_handle.fd
 
-    status = ioctl(fd, GPIOHANDLE_SET_LINE_VALUES_IOCTL, data)
+def _line_bulk_handle(bulk: gpiod_line_bulk) -> Optional[line_fd_handle]:
+    # The kernel only sets values and config of lines requested together.
+    handle = bulk[0].fd_handle
+    if any(line.fd_handle is not handle for line in bulk):
+        set_errno(EINVAL)
+        return None
+
+    return handle
+
+
+def _line_bulk_is_handle(bulk: gpiod_line_bulk, handle: line_fd_handle) -> bool:
+    return bulk.num_lines == len(handle.lines) and all(
+        line is it for line, it in zip(bulk, handle.lines)
+    )
+
+
+def _line_handle_pack_values(handle: line_fd_handle, bulk: gpiod_line_bulk, packed: bytes) -> bytes:
+    # All lines of a handle are set at once, the lines not in the bulk keep
+    # their current output values.
+    if _line_bulk_is_handle(bulk, handle):
+        return packed
+
+    handle_values = bytearray(line.output_value for line in handle.lines)
+    for line, value in zip(bulk, packed):
+        handle_values[handle.lines.index(line)] = value
+
+    return bytes(handle_values)
+
+
+def _line_set_values(handle: line_fd_handle, packed: bytes) -> int:
+    data = _buffers.handle_data
+    memmove(data.values, packed, len(packed))
+
+    status = ioctl(handle.fd, GPIOHANDLE_SET_LINE_VALUES_IOCTL, data)
     if status < 0:
         return -1
 
-    for i, line in enumerate(bulk):
-        line.output_value = data.values[i]
+    for line, output_value in zip(handle.lines, packed):
+        line.output_value = output_value
 
     return 0
 
@@ -734,40 +986,42 @@ def gpiod_line_set_config_bulk(
     @return 0 is the operation succeeds. In case of an error this routine
             returns -1 and sets the last error number.
 
-    If the lines were not previously requested together, the behavior is
-    undefined.
+    If the lines were not previously requested together, this routine fails
+    with EINVAL. The kernel applies the config to every line requested
+    together with the bulk, the lines not in the bulk keep their output values.
     """
-    hcfg = gpiohandle_config()
-
     if not _line_bulk_same_chip(bulk) or not _line_bulk_all_requested(bulk):
         return -1
 
     if not _line_request_direction_is_valid(direction):
         return -1
 
-    memset(pointer(hcfg), 0, sizeof(hcfg))
+    handle = _line_bulk_handle(bulk)
+    if handle is None:
+        return -1
 
+    hcfg = _buffers.handle_config
     hcfg.flags = _line_request_flag_to_gpio_handleflag(flags)
     hcfg.flags |= _line_request_direction_to_gpio_handleflag(direction)
-    if direction == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT and values is not None:
-        for i in range(bulk.num_lines):
-            hcfg.default_values[i] = 1 if values[i] else 0
+    packed = _line_handle_pack_values(handle, bulk, _line_bulk_pack_values(bulk, values))
+    memmove(hcfg.default_values, packed, len(packed))
 
-    fd = bulk[0].fd_handle.fd
-
-    status = ioctl(fd, GPIOHANDLE_SET_CONFIG_IOCTL, hcfg)
+    status = ioctl(handle.fd, GPIOHANDLE_SET_CONFIG_IOCTL, hcfg)
     if status < 0:
         return -1
 
-    for i, line in enumerate(bulk):
+    for line, output_value in zip(handle.lines, packed):
         line.req_flags = flags
         if direction == GPIOD_LINE_REQUEST_DIRECTION_OUTPUT:
-            line.output_value = hcfg.default_values[i]
+            line.output_value = output_value
 
-        rv = gpiod_line_update(line)
+        rv = _line_update_requested(line, hcfg.flags, None)
         if rv < 0:
             return rv
 
+    if direction == GPIOD_LINE_REQUEST_DIRECTION_AS_IS:
+        return _line_handle_read_values(handle)
+
     return 0
 
 
@@ -881,6 +1135,25 @@ def gpiod_line_set_direction_output_bulk(bulk: gpiod_line_bulk, values: Optional
     )
 
 
+def _line_event_wait_single(
+    line: gpiod_line, timeout: timedelta
+) -> Optional[List[Tuple[int, int]]]:
+    # Only event handles can be polled for edges.
+    if line.state != _LINE_REQUESTED_EVENTS:
+        set_errno(EPERM)
+        return None
+
+    # Waiting on a single line is the common case, keep an epoll instance
+    # registered with its fd instead of setting up a poll() every time.
+    handle = line.fd_handle
+
+    if handle.epoll is None:
+        handle.epoll = select.epoll(1)
+        handle.epoll.register(handle.fd, EPOLLIN | EPOLLPRI)
+
+    return handle.epoll.poll(timeout.total_seconds(), 1)
+
+
 def gpiod_line_event_wait(line: gpiod_line, timeout: timedelta) -> int:
     """
     @brief Wait for an event on a single line.
@@ -891,11 +1164,11 @@ def gpiod_line_event_wait(line: gpiod_line, timeout: timedelta) -> int:
     @return 0 if wait timed out, -1 if an error occurred, 1 if an event
             occurred.
     """
-    bulk = gpiod_line_bulk()
-
-    bulk.add(line)
+    revents = _line_event_wait_single(line, timeout)
+    if revents is None:
+        return -1
 
-    return gpiod_line_event_wait_bulk(bulk, timeout, None)
+    return 1 if revents else 0
 
 
 def gpiod_line_event_wait_bulk(
@@ -913,22 +1186,31 @@ def gpiod_line_event_wait_bulk(
 
     @return 0 if wait timed out, -1 if an error occurred, 1 if at least one
             event occurred.
+
+    If any of the lines was not requested for events, this routine fails with
+    EPERM.
     """
     if not _line_bulk_same_chip(bulk) or not _line_bulk_all_requested(bulk):
         return -1
 
-    poll = select.poll()
+    # Only event handles can be polled for edges, whatever the bulk size.
+    if any(it.state != _LINE_REQUESTED_EVENTS for it in bulk):
+        set_errno(EPERM)
+        return -1
+
     fd_to_line = {}
 
-    for it in bulk:
-        poll.register(it.fd_handle.fd, POLLIN | POLLPRI)
-        fd_to_line[it.fd_handle.fd] = it
+    if bulk.num_lines == 1:
+        fd_to_line[bulk[0].fd_handle.fd] = bulk[0]
+        revents = _line_event_wait_single(bulk[0], timeout)
+    else:
+        poll = select.poll()
 
-    timeout_ms = (
-        (timeout.days * 86_400_000) + (timeout.seconds * 1_000) + (timeout.microseconds / 1000.0)
-    )
+        for it in bulk:
+            poll.register(it.fd_handle.fd, POLLIN | POLLPRI)
+            fd_to_line[it.fd_handle.fd] = it
 
-    revents = poll.poll(timeout_ms)
+        revents = poll.poll(timeout.total_seconds() * 1000)
 
     if revents is None:
         return -1
@@ -967,6 +1249,29 @@ def gpiod_line_event_read(line: gpiod_line, event: gpiod_line_event) -> int:
     return gpiod_line_event_read_fd(fd, event)
 
 
+def gpiod_line_event_read_multiple(
+    line: gpiod_line, events: List[gpiod_line_event], num_events: int
+) -> int:
+    """
+    @brief Read up to a certain number of events from the GPIO line.
+
+    @param line:       GPIO line object.
+    @param events:     Buffer to which the event data will be copied. Must hold
+                       at least the amount of events specified in num_events.
+    @param num_events: Specifies how many events can be stored in the buffer.
+
+    @return On success returns the number of events stored in the buffer, on
+            failure -1 is returned.
+
+    @note This function will block if no event was queued for this line.
+    """
+    fd = gpiod_line_event_get_fd(line)
+    if fd < 0:
+        return -1
+
+    return gpiod_line_event_read_fd_multiple(fd, events, num_events)
+
+
 def gpiod_line_event_get_fd(line: gpiod_line) -> int:
     """
     @brief Get the event file descriptor.
@@ -1000,33 +1305,68 @@ def gpiod_line_event_read_fd(fd: int, event: gpiod_line_event) -> int:
     directly read the event data from it using this routine. This function
     translates the kernel representation of the event to the libgpiod format.
     """
-    evdata = gpioevent_data()
+    evdata = _buffers.event_data
 
+    # Read straight into the reused buffer, no intermediate bytes object.
     try:
-        rd = os_read(fd, sizeof(evdata))
-    except OSError:
+        rd = readv(fd, (evdata,))
+    except OSError as e:
+        set_errno(e.errno)
         return -1
 
-    if len(rd) != sizeof(evdata):
+    if rd != _EVDATA_SIZE:
         set_errno(EIO)
         return -1
 
-    memmove(pointer(evdata), rd, sizeof(evdata))
+    _line_event_from_evdata(*_EVDATA_STRUCT.unpack_from(evdata), event)
 
-    event.event_type = (
-        GPIOD_LINE_EVENT_RISING_EDGE
-        if evdata.id == GPIOEVENT_EVENT_RISING_EDGE
-        else GPIOD_LINE_EVENT_FALLING_EDGE
-    )
+    return 0
 
-    sec = evdata.timestamp // 1_000_000_000
-    event.ts = datetime(year=1970, month=1, day=1) + timedelta(
-        days=sec // 86400,
-        seconds=sec % 86400,
-        microseconds=(evdata.timestamp % 1_000_000_000) // 1000,
-    )
 
-    return 0
+def gpiod_line_event_read_fd_multiple(
+    fd: int, events: List[gpiod_line_event], num_events: int
+) -> int:
+    """
+    @brief Read up to a certain number of events directly from a file
+           descriptor.
+
+    @param fd:         File descriptor.
+    @param events:     Buffer to which the event data will be copied. Must hold
+                       at least the amount of events specified in num_events.
+    @param num_events: Specifies how many events can be stored in the buffer.
+
+    @return On success returns the number of events stored in the buffer, on
+            failure -1 is returned.
+
+    All the events queued by the kernel, up to num_events (at most 16), are
+    read with a single read() call.
+    """
+    evdata = _buffers.event_data_multiple
+
+    num_events = min(num_events, _LINE_EVENT_READ_MAX)
+
+    try:
+        rd = readv(fd, (evdata[: num_events * _EVDATA_SIZE],))
+    except OSError as e:
+        set_errno(e.errno)
+        return -1
+
+    if rd == 0 or rd % _EVDATA_SIZE:
+        set_errno(EIO)
+        return -1
+
+    num_read = rd // _EVDATA_SIZE
+    for i in range(num_read):
+        _line_event_from_evdata(*_EVDATA_STRUCT.unpack_from(evdata, i * _EVDATA_SIZE), events[i])
+
+    return num_read
+
+
+def _line_event_from_evdata(timestamp: int, evid: int, event: gpiod_line_event) -> None:
+    event.event_type = _EVENT_TYPE[evid == GPIOEVENT_EVENT_RISING_EDGE]
+
+    # timedelta normalizes the microseconds into days and seconds itself.
+    event.ts = _EPOCH + timedelta(microseconds=timestamp // 1000)
 
 
 # helpers.c
@@ -1040,7 +1380,7 @@ def gpiod_chip_open_by_name(name: str) -> Optional[gpiod_chip]:
 
     @return GPIO chip handle or None if an error occurred.
     """
-    return gpiod_chip_open("/dev/" + str(name))
+    return gpiod_chip_open(f"/dev/{name}")
 
 
 def gpiod_chip_open_by_number(num: Union[int, str]) -> Optional[gpiod_chip]:
@@ -1051,7 +1391,17 @@ def gpiod_chip_open_by_number(num: Union[int, str]) -> Optional[gpiod_chip]:
 
     @return GPIO chip handle or None if an error occurred.
     """
-    return gpiod_chip_open("/dev/gpiochip" + str(num))
+    return gpiod_chip_open(f"/dev/gpiochip{num}")
+
+
+# Name of the chip each label was last seen on. It is only a hint, the label
+# is checked again after opening the chip.
+_chip_labels: Dict[str, str] = {}
+
+# Chip name and offset of every named line seen by gpiod_line_find(). Line
+# names rarely change, so a later lookup only has to open the one chip it
+# needs. The line name is checked again after getting the line.
+_line_index: Dict[str, Tuple[str, int]] = {}
 
 
 def gpiod_chip_open_by_label(label: str) -> Optional[gpiod_chip]:
@@ -1066,11 +1416,21 @@ def gpiod_chip_open_by_label(label: str) -> Optional[gpiod_chip]:
     @note If the chip cannot be found but no other error occurred, errno is set
           to ENOENT.
     """
+    name = _chip_labels.get(label)
+    if name is not None:
+        chip = gpiod_chip_open_by_name(name)
+        if chip is not None:
+            if chip.label == label:
+                return chip
+
+            gpiod_chip_close(chip)
+
+        _chip_labels.pop(label, None)
+
     chip_iter = iter(gpiod_chip_iter())
-    if chip_iter is None:
-        return None
 
     for chip in chip_iter:
+        _chip_labels.setdefault(chip.label, chip.name)
         if chip.label == label:
             # gpiod_chip_iter_free_noclose
             return chip
@@ -1092,20 +1452,27 @@ def gpiod_chip_open_lookup(descr: Union[int, str]) -> Optional[gpiod_chip]:
     This routine tries to figure out whether the user passed it the path to the
     GPIO chip, its name, label or number as a string. Then it tries to open it
     using one of the gpiod_chip_open** variants.
-    """
-    if isinstance(descr, int):
-        descr = str(descr)
 
-    if descr.isdigit():
+    Paths and gpiochip names are tried before labels, since they need a single
+    open() while a label lookup may have to open every chip. Other names in
+    /dev (e.g. udev symlinks) are tried if no chip has the label.
+    """
+    if isinstance(descr, int) or descr.isdigit():
         return gpiod_chip_open_by_number(descr)
 
-    chip = gpiod_chip_open_by_label(descr)
+    if descr.startswith("/dev/"):
+        return gpiod_chip_open(descr)
 
-    if not bool(chip):
-        if descr[:5] != "/dev/":
-            return gpiod_chip_open_by_name(descr)
+    # Only names the kernel gives to gpiochips, so a label is never taken for
+    # an arbitrary /dev node.
+    if descr.startswith("gpiochip") and descr[8:].isdigit():
+        chip = gpiod_chip_open_by_name(descr)
+        if chip is not None:
+            return chip
 
-        return gpiod_chip_open(descr)
+    chip = gpiod_chip_open_by_label(descr)
+    if chip is None:
+        return gpiod_chip_open_by_name(descr)
 
     return chip
 
@@ -1136,13 +1503,106 @@ def gpiod_chip_find_line(chip: gpiod_chip, name: str) -> Optional[gpiod_line]:
     return None
 
 
+def _line_index_lookup(name: str) -> Optional[gpiod_line]:
+    hint = _line_index.pop(name, None)
+    if hint is None:
+        return None
+
+    chip_name, offset = hint
+    chip = gpiod_chip_open_by_name(chip_name)
+    if chip is None:
+        return None
+
+    line = gpiod_chip_get_line(chip, offset) if offset < chip.num_lines else None
+    if line is None or line.name != name:
+        gpiod_chip_close(chip)
+        return None
+
+    _line_index[name] = hint
+    return line
+
+
+def gpiod_line_find(name: str) -> Optional[gpiod_line]:
+    """
+    @brief Find a GPIO line by its name.
+
+    @param name: Name of the GPIO line.
+
+    @return Returns the GPIO line handle if the line exists in the system or
+            None if it couldn't be located or an error occurred.
+
+    If this routine succeeds, the user must manually close the GPIO chip owning
+    this line to avoid memory leaks. If the line could not be found, this
+    function sets errno to ENOENT.
+    """
+    line = _line_index_lookup(name)
+    if line is not None:
+        return line
+
+    # Names seen by an earlier scan may have moved, the first line with a name
+    # found by this scan replaces its entry.
+    indexed = set()
+
+    for chip in iter(gpiod_chip_iter()):
+        found = None
+        for line in gpiod_line_iter(chip):
+            if line.name and line.name not in indexed:
+                indexed.add(line.name)
+                _line_index[line.name] = (chip.name, line.offset)
+
+            if found is None and line.name == name:
+                found = line
+
+        if found is not None:
+            # gpiod_chip_iter_free_noclose
+            return found
+
+    set_errno(ENOENT)
+
+    return None
+
+
 # iter.c
 
+# GPIO chips are rarely added or removed, so the result of scanning /dev is
+# reused for a short while instead of rescanning on every iteration.
+_CHIP_PATHS_TTL = 2.0
+
+_chip_paths: Optional[List[str]] = None
+_chip_paths_time = 0.0
+
+
+def _gpiochip_paths() -> List[str]:
+    # pylint: disable=global-statement
+    global _chip_paths, _chip_paths_time
+
+    now = monotonic()
+    if _chip_paths is None or now - _chip_paths_time >= _CHIP_PATHS_TTL:
+        # Sort numerically so that gpiochip10 comes after gpiochip9.
+        with scandir("/dev") as entries:
+            names = [
+                it.name
+                for it in entries
+                if it.name.startswith("gpiochip") and it.name[8:].isdigit()
+            ]
+        names.sort(key=lambda name: int(name[8:]))
+        _chip_paths = ["/dev/" + name for name in names]
+        _chip_paths_time = now
+
+    return _chip_paths
+
+
+def _gpiochip_paths_invalidate() -> None:
+    # pylint: disable=global-statement
+    global _chip_paths
+    _chip_paths = None
+
 
 class gpiod_chip_iter:
     def __init__(self) -> None:
-        self.chips = []
+        self.paths = []
         self.offset = 0
+        self.current = None
 
     def __iter__(self) -> Iterator[gpiod_chip]:
         """
@@ -1150,25 +1610,14 @@ class gpiod_chip_iter:
 
         @brief Create a new gpiochip iterator.
 
-        @return A new chip iterator object or None if an error occurred.
-        """
-        dirs = []
-        for it in scandir("/dev"):
-            if it.name[:8] == "gpiochip":
-                dirs.append(it.path)
-
-        if len(dirs) == 0:
-            return None
-
-        for it in dirs:
-            chip = gpiod_chip_open(it)
-            if chip is None:
-                for c in self.chips:
-                    gpiod_chip_close(c)
-                self.chips.clear()
-                return None
+        @return A new chip iterator object.
 
-            self.chips.append(chip)
+        @note Chips are opened one at a time as the iterator advances. If no
+              chips are present on the system, the iteration is empty.
+        """
+        self.paths = _gpiochip_paths()
+        self.offset = 0
+        self.current = None
 
         return self
 
@@ -1184,11 +1633,27 @@ class gpiod_chip_iter:
         @note This function works just like ::gpiod_chip_iter_next but doesn't
               close the most recently opened chip handle.
         """
-        if self.offset < len(self.chips):
-            index = self.offset
+        while self.offset < len(self.paths):
+            path = self.paths[self.offset]
             self.offset += 1
-            return self.chips[index]
 
+            chip = gpiod_chip_open(path)
+            if chip is not None:
+                self.current = chip
+                return chip
+
+            errno = get_errno()
+            if errno == ENOENT:
+                # The chip is gone since /dev was scanned, skip it and forget
+                # everything cached about the chips.
+                gpiod_invalidate_caches()
+                continue
+
+            # The cached scan may be stale, rescan on the next attempt.
+            _gpiochip_paths_invalidate()
+            raise OSError(errno, strerror(errno), path)
+
+        self.current = None
         raise StopIteration
 
     def __next__(self) -> gpiod_chip:
@@ -1202,9 +1667,9 @@ class gpiod_chip_iter:
 
         @note The previous chip handle will be closed.
         """
-        if self.offset > 0:
-            gpiod_chip_close(self.chips[self.offset - 1])
-            self.chips[self.offset - 1] = None
+        if self.current is not None:
+            gpiod_chip_close(self.current)
+            self.current = None
 
         return self.next_noclose()
 
@@ -1218,10 +1683,14 @@ class gpiod_line_iter:
 
     def __iter__(self) -> Iterator[gpiod_line]:
         # gpiod_line_iter_new(chip)
-        for i in range(self.chip.num_lines):
-            self.lines.append(gpiod_chip_get_line(self.chip, i))
-            if self.lines[i] is None:
-                del self.lines
+        chip = self.chip
+        lines = [None] * chip.num_lines
+        for i in range(chip.num_lines):
+            line = gpiod_chip_get_line(chip, i)
+            if line is None:
                 return iter([])
 
-        return iter(self.lines)
+            lines[i] = line
+
+        self.lines = lines
+        return iter(lines)
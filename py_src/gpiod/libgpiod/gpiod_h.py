@@ -23,7 +23,10 @@ SOFTWARE.
 """
 from __future__ import annotations
 
+from ctypes import c_uint32
+from itertools import islice
 from os import close as os_close
+from select import epoll
 from typing import Iterator, List, Optional
 
 
@@ -39,29 +42,45 @@ GPIOD_LINE_BULK_MAX_LINES = 64
 
 
 class gpiod_line_bulk:
-    # pylint: disable=function-redefined
+    __slots__ = ("_lines", "num_lines", "offsets", "chip", "same_chip")
+
     def __init__(self) -> None:
         # gpiod_line_bulk_init(bulk)
-        self._lines = []
+        self._lines: List[Optional[gpiod_line]] = [None] * GPIOD_LINE_BULK_MAX_LINES
+        # gpiod_line_bulk_num_lines(bulk)
+        self.num_lines = 0
+        # Line offsets laid out like gpiohandle_request.lineoffsets
+        self.offsets = (c_uint32 * GPIOD_LINE_BULK_MAX_LINES)()
+        # Chip of the first line and whether all other lines share it
+        self.chip: Optional[gpiod_chip] = None
+        self.same_chip = True
 
     # pylint: disable=missing-function-docstring
 
     def add(self, line: gpiod_line) -> None:
         # gpiod_line_bulk_add(bulk, line)
-        if self.num_lines < GPIOD_LINE_BULK_MAX_LINES:
-            self._lines.append(line)
+        num_lines = self.num_lines
+        if num_lines < GPIOD_LINE_BULK_MAX_LINES:
+            if num_lines == 0:
+                self.chip = line.chip
+            elif line.chip is not self.chip:
+                self.same_chip = False
 
-    @property
-    def num_lines(self) -> int:
-        # gpiod_line_bulk_num_lines(bulk)
-        return len(self._lines)
+            self.offsets[num_lines] = line.offset
+            self._lines[num_lines] = line
+            self.num_lines = num_lines + 1
 
     def __getitem__(self, offset: int) -> gpiod_line:
         # gpiod_line_bulk_get_line(bulk, offset)
+        if offset < 0:
+            offset += self.num_lines
+        if not 0 <= offset < self.num_lines:
+            raise IndexError("bulk index out of range")
+
         return self._lines[offset]
 
     def __iter__(self) -> Iterator[gpiod_line]:
-        return iter(self._lines)
+        return islice(self._lines, self.num_lines)
 
 
 GPIOD_LINE_DIRECTION_INPUT = 1
@@ -91,6 +110,8 @@ GPIOD_LINE_REQUEST_FLAG_BIAS_PULL_UP = GPIOD_BIT(5)
 
 
 class gpiod_line_request_config:
+    __slots__ = ("consumer", "request_type", "flags")
+
     def __init__(self) -> None:
         self.consumer = ""
         self.request_type = 0
@@ -102,6 +123,8 @@ GPIOD_LINE_EVENT_FALLING_EDGE = 2
 
 
 class gpiod_line_event:
+    __slots__ = ("ts", "event_type")
+
     def __init__(self) -> None:
         self.ts = None
         self.event_type = 0
@@ -115,16 +138,38 @@ class gpiod_line_event:
 
 
 class line_fd_handle:
-    def __init__(self, fd) -> None:
+    __slots__ = ("fd", "lines", "epoll")
+
+    def __init__(self, fd, lines: List["gpiod_line"]) -> None:
         self.fd = fd
+        # Lines of the handle in request order, as laid out in handle data
+        self.lines = lines
+        # epoll object watching fd, created on the first event wait
+        self.epoll: Optional[epoll] = None
 
     def __del__(self) -> None:
         # line_fd_decref(line)
+        if self.epoll is not None:
+            self.epoll.close()
         os_close(self.fd)
 
 
 class gpiod_line:
-    # pylint: disable=function-redefined, too-many-instance-attributes
+    # pylint: disable=too-many-instance-attributes
+    __slots__ = (
+        "offset",
+        "direction",
+        "active_state",
+        "output_value",
+        "info_flags",
+        "req_flags",
+        "state",
+        "chip",
+        "fd_handle",
+        "name",
+        "consumer",
+    )
+
     def __init__(self, chip: gpiod_chip) -> None:
         self.offset = 0
         self.direction = 0
@@ -146,9 +191,12 @@ class gpiod_line:
 
 
 class gpiod_chip:
-    # pylint: disable=function-redefined
+    __slots__ = ("lines", "_allocated", "_num_lines", "_fd", "_name", "_label")
+
     def __init__(self, num_lines: int, fd: int, name: str, label: str) -> None:
         self.lines: List[gpiod_line] = [None] * num_lines
+        # Line objects created so far, in creation order
+        self._allocated: List[gpiod_line] = []
         self._num_lines = num_lines
         self._fd = fd
         # size 32
@@ -28,6 +28,7 @@ from ctypes import get_errno
 from datetime import timedelta
 from errno import ENOENT
 from os import strerror
+from threading import local
 from typing import Iterator, List, Optional, TypeVar, Union
 
 from .. import libgpiod
@@ -46,6 +47,23 @@ _LINE_BIAS_PULL_UP = 3
 _LINE_BIAS_PULL_DOWN = 4
 
 
+class _event_buffers(local):
+    """
+    @brief Per-thread libgpiod event buffers, overwritten by every read. The
+           line_event objects handed out are always new objects.
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        super().__init__()
+        self.event = libgpiod.gpiod_line_event()
+        # As many events as libgpiod reads at once
+        # pylint: disable=protected-access
+        self.events = [libgpiod.gpiod_line_event() for _ in range(libgpiod._LINE_EVENT_READ_MAX)]
+
+
+_buffers = _event_buffers()
+
 open_funcs = {
     _CHIP_OPEN_LOOKUP: libgpiod.gpiod_chip_open_lookup,
     _CHIP_OPEN_BY_PATH: libgpiod.gpiod_chip_open,
@@ -77,7 +95,6 @@ class shared_chip:
 
 
 class chip:
-    # pylint: disable=function-redefined
     def __init__(
         self,
         device: Optional[Union[int, str]] = None,
@@ -334,7 +351,6 @@ class chip:
 
 
 class line_request:
-    # pylint: disable=function-redefined
     # pylint: disable=too-few-public-methods
     DIRECTION_AS_IS = 1
     DIRECTION_INPUT = 2
@@ -384,8 +400,20 @@ bias_mapping = {
 }
 
 
+def _make_request_config(config: line_request) -> libgpiod.gpiod_line_request_config:
+    conf = libgpiod.gpiod_line_request_config()
+    conf.consumer = config.consumer
+    conf.request_type = reqtype_mapping[config.request_type]
+    conf.flags = 0
+
+    for k, v in reqflag_mapping.items():
+        if config.flags & k:
+            conf.flags |= v
+
+    return conf
+
+
 class line:
-    # pylint: disable=function-redefined
     def __init__(
         self,
         line_struct: Optional[libgpiod.gpiod_line] = None,
@@ -541,14 +569,7 @@ class line:
         """
         _m_line = self._throw_if_null_and_get_m_line()
 
-        conf = libgpiod.gpiod_line_request_config()
-        conf.consumer = config.consumer
-        conf.request_type = reqtype_mapping[config.request_type]
-        conf.flags = 0
-
-        for k, v in reqflag_mapping.items():
-            if config.flags & k:
-                conf.flags |= v
+        conf = _make_request_config(config)
 
         rv = libgpiod.gpiod_line_request(_m_line, conf, default_val)
         if rv:
@@ -692,14 +713,41 @@ class line:
         """
         _m_line = self._throw_if_null_and_get_m_line()
 
-        event_buf = libgpiod.gpiod_line_event()
-        event = line_event()
+        event_buf = _buffers.event
 
         rv = libgpiod.gpiod_line_event_read(_m_line, event_buf)
         if rv < 0:
             errno = get_errno()
             raise OSError(errno, strerror(errno), "error reading line event")
 
+        return self._make_line_event(event_buf)
+
+    def event_read_multiple(self) -> List[line_event]:
+        """
+        @brief Read up to 16 line events at once.
+
+        @return List of line event objects.
+
+        Usage:
+            if line.event_wait(timedelta(seconds=10)):
+                for event in line.event_read_multiple():
+                    print(event.event_type == line_event.RISING_EDGE)
+                    print(event.timestamp)
+        """
+        _m_line = self._throw_if_null_and_get_m_line()
+
+        event_bufs = _buffers.events
+
+        rv = libgpiod.gpiod_line_event_read_multiple(_m_line, event_bufs, len(event_bufs))
+        if rv < 0:
+            errno = get_errno()
+            raise OSError(errno, strerror(errno), "error reading multiple line events")
+
+        return [self._make_line_event(event_buf) for event_buf in event_bufs[:rv]]
+
+    def _make_line_event(self, event_buf: libgpiod.gpiod_line_event) -> line_event:
+        event = line_event()
+
         if event_buf.event_type == libgpiod.GPIOD_LINE_EVENT_RISING_EDGE:
             event.event_type = line_event.RISING_EDGE
         elif event_buf.event_type == libgpiod.GPIOD_LINE_EVENT_FALLING_EDGE:
@@ -830,7 +878,6 @@ class line:
 
 
 class line_event:
-    # pylint: disable=function-redefined
     # pylint: disable=too-few-public-methods
     RISING_EDGE = 1
     FALLING_EDGE = 2
@@ -842,7 +889,6 @@ class line_event:
 
 
 class line_bulk:
-    # pylint: disable=function-redefined
     # pylint: disable=missing-function-docstring
     def __init__(self, lines: Optional[List[line]] = None) -> None:
         """
@@ -983,12 +1029,16 @@ class line_bulk:
         if self.size != len(default_vals):
             raise ValueError("the number of default values must correspond to the number of lines")
 
-        try:
-            for i in range(self.size):
-                self._m_bulk[i].request(config, default_vals[i])
-        except OSError as error:
-            self.release()
-            raise error
+        conf = _make_request_config(config)
+
+        bulk = libgpiod.gpiod_line_bulk()
+
+        self._to_line_bulk(bulk)
+
+        rv = libgpiod.gpiod_line_request_bulk(bulk, conf, default_vals)
+        if rv:
+            errno = get_errno()
+            raise OSError(errno, strerror(errno), "error requesting GPIO lines")
 
     def release(self) -> None:
         """
@@ -999,8 +1049,11 @@ class line_bulk:
         """
         self._throw_if_empty()
 
-        for it in self._m_bulk:
-            it.release()
+        bulk = libgpiod.gpiod_line_bulk()
+
+        self._to_line_bulk(bulk)
+
+        libgpiod.gpiod_line_release_bulk(bulk)
 
     def get_values(self) -> List[int]:
         """
@@ -1014,9 +1067,15 @@ class line_bulk:
         """
         self._throw_if_empty()
 
-        values = []
-        for it in self._m_bulk:
-            values.append(it.get_value())
+        bulk = libgpiod.gpiod_line_bulk()
+        values = [0] * self.size
+
+        self._to_line_bulk(bulk)
+
+        rv = libgpiod.gpiod_line_get_value_bulk(bulk, values)
+        if rv:
+            errno = get_errno()
+            raise OSError(errno, strerror(errno), "error reading GPIO line values")
 
         return values
 
@@ -1027,16 +1086,26 @@ class line_bulk:
         @param values: List of values to set. Must be the same size as the
                number of lines held by this line_bulk.
 
+        If all lines are outputs already driven to these values, the kernel is
+        not called. Lines requested together with these lines but not held by
+        this object keep their values.
+
         Usage:
-            bulk.set)_blaues([1] * bulk.size)
+            bulk.set_values([1] * bulk.size)
         """
         self._throw_if_empty()
 
         if self.size != len(values):
             raise ValueError("the size of values array must correspond to the number of lines")
 
-        for i in range(self.size):
-            self._m_bulk[i].set_value(values[i])
+        bulk = libgpiod.gpiod_line_bulk()
+
+        self._to_line_bulk(bulk)
+
+        rv = libgpiod.gpiod_line_set_value_bulk(bulk, values)
+        if rv:
+            errno = get_errno()
+            raise OSError(errno, strerror(errno), "error setting GPIO line values")
 
     def set_config(self, direction: int, flags: int, values: Optional[List[int]] = None) -> None:
         """